@@ -14,8 +14,13 @@ import matplotlib.pyplot as plt
 from datetime import datetime
 from joblib import Parallel, delayed
 import scipy.signal as signal
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from utils.data_utils import ensure_dir, save_results
+
 # -------------------------------
 # Helper functions
 # -------------------------------
@@ -192,7 +197,7 @@ def process_ttm_combined(ttm, base_dir, Q_plots_dir, Q_data_dir, Q_matrix_dir,
     
     # Create directories for combined Q-IV plots (all under Combined)
     combined_dir = os.path.join(Q_plots_dir, f"Combined_tau_{ttm}")
-    os.makedirs(combined_dir, exist_ok=True)
+    ensure_dir(combined_dir)
     
     # Intermediate directories for different groups:
     S0_dir = os.path.join(combined_dir, "S0_raw")
@@ -203,7 +208,7 @@ def process_ttm_combined(ttm, base_dir, Q_plots_dir, Q_data_dir, Q_matrix_dir,
     S3_unimodal_dir = os.path.join(combined_dir, "S3_unimodal")
     S3_multimodal_dir = os.path.join(combined_dir, "S3_multimodal")
     for d in [S0_dir, S1_dir, S1_neg_dir, S2_smooth_dir, S2_nonsmooth_dir, S3_unimodal_dir, S3_multimodal_dir]:
-        os.makedirs(d, exist_ok=True)
+        ensure_dir(d)
     
     # Get date strings from Q density filenames.
     IV_files = sorted(os.listdir(Q_data_ttm_dir))
@@ -373,7 +378,7 @@ def process_ttm_combined(ttm, base_dir, Q_plots_dir, Q_data_dir, Q_matrix_dir,
     S2_smooth_dir = os.path.join(combined_dir, "S2_smooth")
     S2_nonsmooth_dir = os.path.join(combined_dir, "S2_nonsmooth")
     for d in [S2_smooth_dir, S2_nonsmooth_dir]:
-        os.makedirs(d, exist_ok=True)
+        ensure_dir(d)
 
     # Plot smooth densities.
     smooth_save_path = os.path.join(S2_smooth_dir, f'all_smooth_density_{ttm}day.png')
@@ -449,7 +454,7 @@ def process_ttm_combined(ttm, base_dir, Q_plots_dir, Q_data_dir, Q_matrix_dir,
     S3_unimodal_dir = os.path.join(combined_dir, "S3_unimodal")
     S3_multimodal_dir = os.path.join(combined_dir, "S3_multimodal")
     for d in [S3_unimodal_dir, S3_multimodal_dir]:
-        os.makedirs(d, exist_ok=True)
+        ensure_dir(d)
 
     # Plot unimodal densities.
     unimodal_save_path = os.path.join(S3_unimodal_dir, f'all_unimodal_density_{ttm}day.png')
@@ -509,6 +514,8 @@ def process_ttm_combined(ttm, base_dir, Q_plots_dir, Q_data_dir, Q_matrix_dir,
     Q_d15_df.index.name = "Return"
     Q_d15_save_path = os.path.join(Q_matrix_dir, f"Q_matrix_{ttm}day_d15.csv")
     Q_d15_df.to_csv(Q_d15_save_path)
+    # Memory-mappable copy under the name the clustering scripts load (load_q_matrices, suffix "0d15")
+    save_results(Q_d15_df.reset_index(), os.path.join(Q_matrix_dir, f"Q_matrix_{ttm}day_0d15.npy"), file_format="npy")
         
     print(f"Finished processing combined plots for TTM = {ttm} days.")
 
@@ -523,8 +530,8 @@ Q_data_dir = os.path.join(base_dir, 'Q_from_pure_SVI', 'Tau-independent', 'uniqu
 Q_matrix_dir = os.path.join(base_dir, "Q_matrix", "Tau-independent", "unique", "moneyness_step_0d01")
 iv_surface_dir = os.path.join(base_dir, "IV", "IV_surface_SVI", "Tau-independent", "unique", "moneyness_step_0d01")
 obs_data_path = os.path.join(base_dir, "Data", "processed", "20172022_processed_1_3_5_standardized_moneyness.csv")
-os.makedirs(Q_plots_dir, exist_ok=True)
-os.makedirs(Q_matrix_dir, exist_ok=True)
+ensure_dir(Q_plots_dir)
+ensure_dir(Q_matrix_dir)
 
 ttm = 27
 process_ttm_combined(ttm, base_dir, Q_plots_dir, Q_data_dir, Q_matrix_dir,
@@ -5,7 +5,12 @@ import pandas as pd
 import os
 from scipy.stats.mstats import gmean
 from matplotlib.colors import ListedColormap
+import sys
 from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from utils.data_utils import load_q_matrices
 # ========================================================================================================
 #data preprocessing, dimensionality reduction using UMAP, and visualization of results in 2D and 3D.
 # ========================================================================================================
@@ -13,11 +18,12 @@ from pathlib import Path
 BASE_DIR = Path(os.environ.get("BTC_PREMIA_BASE", Path(__file__).resolve().parents[2])).expanduser()
 Q_MATRIX_DIR = BASE_DIR / "Q_matrix" / "Tau-independent" / "unique" / "moneyness_step_0d01"
 RANDOM_STATE = int(os.environ.get("BTC_PREMIA_RANDOM_SEED", "42"))
-# Load the .csv files into Pandas DataFrames
-df1 = pd.read_csv(Q_MATRIX_DIR / 'Q_matrix_5day_0d15.csv')
-df2 = pd.read_csv(Q_MATRIX_DIR / 'Q_matrix_9day_0d15.csv')
-df3 = pd.read_csv(Q_MATRIX_DIR / 'Q_matrix_14day_0d15.csv')
-df4 = pd.read_csv(Q_MATRIX_DIR / 'Q_matrix_27day_0d15.csv')
+# Load the Q matrices into Pandas DataFrames (read concurrently)
+q_matrices = load_q_matrices(Q_MATRIX_DIR, [5, 9, 14, 27])
+df1 = q_matrices[5]
+df2 = q_matrices[9]
+df3 = q_matrices[14]
+df4 = q_matrices[27]
 
 #Transformation
 def clr(x):
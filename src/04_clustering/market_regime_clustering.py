@@ -3,10 +3,9 @@ for name in list(globals()):
         del globals()[name]
 
 
-import pandas as pd
 import os
+import sys
 import numpy as np
-from scipy.stats.mstats import gmean
 import scipy
 from scipy.spatial import distance_matrix
 import scipy.cluster.hierarchy as sch
@@ -16,6 +15,11 @@ import matplotlib.pyplot as plt
 from cycler import cycler
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from utils.data_utils import load_q_matrices
+from utils.math_utils import clr_transform
+
 # =======================================================
 # Load the Q vectors and find common columns
 # =======================================================
@@ -28,11 +32,12 @@ new_colors = ['#000000', '#0000FF', '#FF0000'] + default_colors[3:]
 plt.rcParams['axes.prop_cycle'] = cycler(color=new_colors)
 BASE_DIR = Path(os.environ.get("BTC_PREMIA_BASE", Path(__file__).resolve().parents[2])).expanduser()
 Q_MATRIX_DIR = BASE_DIR / "Q_matrix" / "Tau-independent" / "unique" / "moneyness_step_0d01"
-# Load the Q vectors from the four different time-to-maturity (ttm) periods
-df1 = pd.read_csv(Q_MATRIX_DIR / 'Q_matrix_5day_0d15.csv') # delete 20180610, 20181118
-df2 = pd.read_csv(Q_MATRIX_DIR / 'Q_matrix_9day_0d15.csv')
-df3 = pd.read_csv(Q_MATRIX_DIR / 'Q_matrix_14day_0d15.csv')
-df4 = pd.read_csv(Q_MATRIX_DIR / 'Q_matrix_27day_0d15.csv')
+# Load the Q vectors from the four different time-to-maturity (ttm) periods (read concurrently)
+q_matrices = load_q_matrices(Q_MATRIX_DIR, [5, 9, 14, 27])
+df1 = q_matrices[5] # delete 20180610, 20181118
+df2 = q_matrices[9]
+df3 = q_matrices[14]
+df4 = q_matrices[27]
 # Get the column names from each DataFrame
 columns1 = list(df1.columns)[1:]
 columns2 = list(df2.columns)[1:]
@@ -47,7 +52,7 @@ print("Common date columns:", common_columns)
 # CLR Transformation as the paper: log(x) - log(gmean(x))
 # =======================================================
 def clr(x):
-   return np.log(x) - np.log(gmean(x))
+   return clr_transform(x)
 df1_clr = clr(df1.drop(['Return'], axis=1))
 df2_clr = clr(df2.drop(['Return'], axis=1))
 df3_clr = clr(df3.drop(['Return'], axis=1))
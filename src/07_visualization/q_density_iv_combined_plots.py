@@ -7,8 +7,13 @@ from scipy.interpolate import PchipInterpolator
 import matplotlib.pyplot as plt
 from datetime import datetime
 from joblib import Parallel, delayed
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[2] / "src"))
+
+from utils.data_utils import ensure_dir
+
 # -------------------------------
 # Helper functions
 # -------------------------------
@@ -185,7 +190,7 @@ def process_ttm_combined(ttm, base_dir, Q_plots_dir, Q_data_dir, Q_matrix_dir,
     
     # Create directories for combined Q-IV plots (all under Combined)
     combined_dir = os.path.join(Q_plots_dir, "Combined")
-    os.makedirs(combined_dir, exist_ok=True)
+    ensure_dir(combined_dir)
     
     # Intermediate directories for different groups:
     S0_dir = os.path.join(combined_dir, "S0_raw")
@@ -196,7 +201,7 @@ def process_ttm_combined(ttm, base_dir, Q_plots_dir, Q_data_dir, Q_matrix_dir,
     S3_dir = os.path.join(combined_dir, "S3_moment")
     S3_moment_fail_dir = os.path.join(combined_dir, "S3_moment_fail")
     for d in [S0_dir, S1_dir, S1_neg_dir, S2_dir, S2_nonmono_dir, S3_dir, S3_moment_fail_dir]:
-        os.makedirs(d, exist_ok=True)
+        ensure_dir(d)
     
     # Get date strings from Q density filenames.
     IV_files = sorted(os.listdir(Q_data_ttm_dir))
@@ -488,8 +493,8 @@ def main_parallel():
     Q_matrix_dir = os.path.join(base_dir, "Q_matrix", "Tau-independent", "unique", "moneyness_step_0d01")
     iv_surface_dir = os.path.join(base_dir, "IV", "IV_surface_SVI", "Tau-independent", "unique", "moneyness_step_0d01")
     obs_data_path = os.path.join(base_dir, "Data", "processed", "20172022_processed_1_3_5_standardized_moneyness.csv")
-    os.makedirs(Q_plots_dir, exist_ok=True)
-    os.makedirs(Q_matrix_dir, exist_ok=True)
+    ensure_dir(Q_plots_dir)
+    ensure_dir(Q_matrix_dir)
     
     ttm_values = range(3, 121)
     results = Parallel(n_jobs=-2)(
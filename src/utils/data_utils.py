@@ -5,6 +5,9 @@ Common data processing functions used across the project.
 """
 
 import os
+import re
+import csv
+import copy
 import json
 import hashlib
 import platform
@@ -14,6 +17,46 @@ from typing import List, Tuple, Optional, Union
 from pathlib import Path
 from datetime import datetime, timezone
 from importlib import metadata
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from functools import cached_property, lru_cache
+
+
+@lru_cache(maxsize=None)
+def _pyarrow():
+    """Import the optional pyarrow modules on first use; None if unavailable."""
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        import pyarrow.parquet as pq
+    except ImportError:  # optional: fall back to pandas' CSV parser, no Parquet output
+        return None
+    return pa, pacsv, pq
+
+
+# Filename date formats, tried in priority order: YYYY-MM-DD, YYYYMMDD, YYYY_MM_DD
+_DATE_PATTERNS = (
+    re.compile(r'(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})'),
+    re.compile(r'(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})'),
+    re.compile(r'(?P<year>\d{4})_(?P<month>\d{2})_(?P<day>\d{2})'),
+)
+
+
+_mkdir_seen = {}
+
+
+def ensure_dir(path: Union[str, Path]) -> Path:
+    """Create a directory (and parents) once per process; repeat calls are a dict lookup.
+
+    Meant for output directories a script creates repeatedly and never
+    removes; general helpers such as save_results call mkdir directly.
+    """
+    key = os.path.abspath(path)
+    created = _mkdir_seen.get(key)
+    if created is None:
+        os.makedirs(key, exist_ok=True)
+        created = _mkdir_seen[key] = Path(key)
+    return created
 
 
 def load_btc_data(file_path: str) -> pd.DataFrame:
@@ -23,41 +66,94 @@ def load_btc_data(file_path: str) -> pd.DataFrame:
     return df
 
 
-def filter_option_data(df: pd.DataFrame, 
+@dataclass
+class OptionChain:
+    """Option data as contiguous float64 column arrays (struct of arrays)."""
+
+    iv: np.ndarray
+    tau: np.ndarray
+    K: np.ndarray
+    S: np.ndarray
+    option_price: np.ndarray
+    moneyness: Optional[np.ndarray] = None
+
+    # DataFrame column backing each field
+    COLUMNS = {
+        "iv": "IV",
+        "tau": "tau",
+        "K": "K",
+        "S": "BTC_price",
+        "option_price": "option_price",
+        "moneyness": "moneyness",
+    }
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "OptionChain":
+        """Extract each column once as a contiguous float64 array."""
+        arrays = {
+            name: np.ascontiguousarray(df[column].to_numpy(dtype=np.float64))
+            for name, column in cls.COLUMNS.items()
+            if column in df.columns
+        }
+        return cls(**arrays)
+
+    def __len__(self) -> int:
+        return self.iv.shape[0]
+
+    def select(self, indexer: np.ndarray) -> "OptionChain":
+        """Apply the same boolean mask or index array to every column."""
+        return OptionChain(**{
+            field.name: None if getattr(self, field.name) is None else getattr(self, field.name)[indexer]
+            for field in fields(self)
+        })
+
+
+def filter_option_data(df: Union[pd.DataFrame, OptionChain],
                       min_price: float = 10.0,
                       min_btc_price: float = 1500.0,
-                      min_tau: float = 0.0) -> pd.DataFrame:
+                      min_tau: float = 0.0) -> Union[pd.DataFrame, OptionChain]:
     """Filter option data based on standard criteria."""
-    # Remove options with IV <= 0
-    df = df[df['IV'] > 0]
-    
-    # Remove options with tau <= 0
-    df = df[df['tau'] > min_tau]
+    if isinstance(df, OptionChain):
+        mask = ((df.iv > 0)
+                & (df.tau > min_tau)
+                & (df.option_price > min_price)
+                & (df.S >= min_btc_price))
+        return df.select(mask)
     
-    # Remove options with price < min_price
-    df = df[df['option_price'] > min_price]
+    # Build one combined mask so the frame is copied once, not per criterion
+    mask = ((df['IV'] > 0)                          # Remove options with IV <= 0
+            & (df['tau'] > min_tau)                 # Remove options with tau <= min_tau
+            & (df['option_price'] > min_price)      # Remove options with price <= min_price
+            & (df['BTC_price'] >= min_btc_price))   # Remove extremely low BTC prices
     
-    # Remove observations with extremely low BTC price
-    df = df[df['BTC_price'] >= min_btc_price]
-    
-    return df
+    return df[mask]
 
 
-def calculate_moneyness(df: pd.DataFrame, 
-                       moneyness_type: str = 'log') -> pd.DataFrame:
+def calculate_moneyness(df: Union[pd.DataFrame, OptionChain],
+                       moneyness_type: str = 'log') -> Union[pd.DataFrame, OptionChain]:
     """Calculate moneyness from strike and underlying price."""
+    if isinstance(df, OptionChain):
+        strike, underlying = df.K, df.S
+    else:
+        strike, underlying = df['K'], df['BTC_price']
+    
     if moneyness_type == 'log':
-        df['moneyness'] = np.log(df['K'] / df['BTC_price'])
+        moneyness = np.log(strike / underlying)
     elif moneyness_type == 'simple':
-        df['moneyness'] = df['K'] / df['BTC_price'] - 1
+        moneyness = strike / underlying - 1
     else:
         raise ValueError("moneyness_type must be 'log' or 'simple'")
     
+    if isinstance(df, OptionChain):
+        df.moneyness = moneyness
+    else:
+        df['moneyness'] = moneyness
+    
     return df
 
 
-def load_iv_matrix(file_path: str) -> pd.DataFrame:
-    """Load IV matrix from CSV file with error handling."""
+@lru_cache(maxsize=32)
+def _load_iv_matrix_cached(file_path: str, mtime: float) -> Optional[pd.DataFrame]:
     try:
         df = pd.read_csv(file_path)
         
@@ -78,42 +174,108 @@ def load_iv_matrix(file_path: str) -> pd.DataFrame:
         return None
 
 
-def extract_date_from_filename(filename: str) -> Optional[str]:
-    """Extract date from filename in various formats."""
-    import re
-    
-    # Try different date patterns
-    patterns = [
-        r'(\d{4}-\d{2}-\d{2})',  # YYYY-MM-DD
-        r'(\d{8})',              # YYYYMMDD
-        r'(\d{4}_\d{2}_\d{2})',  # YYYY_MM_DD
-    ]
+def load_iv_matrix(file_path: str) -> pd.DataFrame:
+    """Load IV matrix from CSV file with error handling.
+
+    Parsed matrices are memoized on (absolute path, mtime); callers receive
+    a copy so the cached frame cannot be mutated.
+    """
+    try:
+        path = os.path.abspath(file_path)
+        mtime = os.path.getmtime(path)
+    except OSError as e:
+        print(f"Error loading {file_path}: {e}")
+        return None
     
-    for pattern in patterns:
-        match = re.search(pattern, filename)
+    df = _load_iv_matrix_cached(path, mtime)
+    return None if df is None else df.copy()
+
+
+def read_numeric_csv(file_path: Union[str, Path]) -> pd.DataFrame:
+    """Read an all-numeric CSV, using PyArrow's multithreaded parser when available."""
+    if _pyarrow() is None:
+        return pd.read_csv(file_path)
+    pa, pacsv, _ = _pyarrow()
+    # Force every column to float64 so all-empty columns become NaN, as with pandas
+    with open(file_path, 'r', newline='') as f:
+        header = next(csv.reader(f), [])
+    convert_options = pacsv.ConvertOptions(column_types={name: pa.float64() for name in header})
+    table = pacsv.read_csv(str(file_path), convert_options=convert_options)
+    # Default conversion consolidates into a writable block, like pd.read_csv
+    return table.to_pandas()
+
+
+def load_npy_frame(file_path: Union[str, Path]) -> pd.DataFrame:
+    """Load a frame written by save_results(..., 'npy') as a read-only memory map."""
+    values = np.load(str(file_path), mmap_mode='r')
+    with open(f"{file_path}.cols", 'r') as f:
+        columns = f.read().split('\n')
+    return pd.DataFrame(values, columns=columns, copy=False)
+
+
+def _read_q_matrix(csv_path: Path) -> pd.DataFrame:
+    """Prefer an up-to-date .npy copy of a Q matrix over parsing its CSV."""
+    npy_path = csv_path.with_suffix('.npy')
+    if npy_path.exists() and Path(f"{npy_path}.cols").exists():
+        if not csv_path.exists() or npy_path.stat().st_mtime >= csv_path.stat().st_mtime:
+            return load_npy_frame(npy_path)
+    return read_numeric_csv(csv_path)
+
+
+def load_q_matrices(q_matrix_dir: Union[str, Path],
+                    ttms: List[int],
+                    suffix: str = "0d15",
+                    max_workers: Optional[int] = None) -> dict:
+    """Load Q_matrix_{ttm}day_{suffix} matrices concurrently, keyed by ttm.
+
+    A .npy file written next to the CSV (see save_results, and the Q-matrix
+    step in q_density_filtering_parallel.py) is memory-mapped instead of
+    parsing the CSV, as long as it is not older than the CSV. Frames loaded
+    this way are read-only; copy() them before modifying values in place.
+    """
+    q_matrix_dir = Path(q_matrix_dir)
+    matrix_files = {ttm: q_matrix_dir / f"Q_matrix_{ttm}day_{suffix}.csv" for ttm in ttms}
+    missing = [str(path) for path in matrix_files.values()
+               if not path.exists() and not path.with_suffix('.npy').exists()]
+    if missing:
+        raise FileNotFoundError(f"Missing Q matrices: {', '.join(missing)}")
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(matrix_files) or None) as pool:
+        futures = {ttm: pool.submit(_read_q_matrix, path) for ttm, path in matrix_files.items()}
+        return {ttm: futures[ttm].result() for ttm in ttms}
+
+
+def extract_date_from_filename(filename: str) -> Optional[str]:
+    """Extract date from filename in various formats, normalized to YYYY-MM-DD."""
+    for pattern in _DATE_PATTERNS:
+        match = pattern.search(filename)
         if match:
-            date_str = match.group(1)
-            # Normalize to YYYY-MM-DD format
-            if len(date_str) == 8:  # YYYYMMDD
-                return f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:8]}"
-            elif '_' in date_str:  # YYYY_MM_DD
-                return date_str.replace('_', '-')
-            else:
-                return date_str
-    
+            return f"{match['year']}-{match['month']}-{match['day']}"
     return None
 
 
+def extract_dates(filenames: List[str]) -> np.ndarray:
+    """Vectorized extract_date_from_filename; unmatched names map to None."""
+    names = pd.Series(list(filenames), dtype=object)
+    dates = np.full(len(names), None, dtype=object)
+    for pattern in _DATE_PATTERNS:
+        parts = names.str.extract(pattern)
+        found = (parts['year'] + '-' + parts['month'] + '-' + parts['day']).to_numpy(dtype=object)
+        fill = pd.isna(dates) & pd.notna(found)
+        dates[fill] = found[fill]
+    return dates
+
+
 def get_common_dates(*dataframes: pd.DataFrame, date_col: str = 'Date') -> List[str]:
     """Find common dates across multiple dataframes."""
     if not dataframes:
         return []
     
-    common_dates = set(dataframes[0][date_col])
+    common_dates = pd.Index(dataframes[0][date_col].unique())
     for df in dataframes[1:]:
-        common_dates = common_dates.intersection(set(df[date_col]))
+        common_dates = common_dates.intersection(pd.Index(df[date_col].unique()))
     
-    return sorted(list(common_dates))
+    return common_dates.sort_values().tolist()
 
 
 def create_return_grid(min_ret: float = -1.0, 
@@ -136,12 +298,29 @@ def save_results(data: Union[pd.DataFrame, dict],
             pd.DataFrame(data).to_csv(output_path, index=False)
     elif file_format.lower() == 'pickle':
         pd.to_pickle(data, output_path)
+    elif file_format.lower() == 'parquet':
+        if _pyarrow() is None:
+            raise ValueError("Parquet output requires the optional pyarrow package")
+        pa, _, pq = _pyarrow()
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, output_path, compression='snappy', use_dictionary=True)
+    elif file_format.lower() == 'npy':
+        # Numeric matrix plus a column-name sidecar; reload with load_npy_frame
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        values = df.to_numpy()
+        if values.dtype == object:
+            raise ValueError("npy format requires numeric data")
+        with open(output_path, 'wb') as f:
+            np.save(f, values)
+        with open(f"{output_path}.cols", 'w') as f:
+            f.write('\n'.join(str(col) for col in df.columns))
     else:
         raise ValueError(f"Unsupported format: {file_format}")
 
 
-def load_config(config_path: str) -> dict:
-    """Load configuration from YAML file."""
+@lru_cache(maxsize=32)
+def _load_config_cached(config_path: str, mtime: float) -> dict:
     import yaml
     
     with open(config_path, 'r') as f:
@@ -150,6 +329,12 @@ def load_config(config_path: str) -> dict:
     return config
 
 
+def load_config(config_path: str) -> dict:
+    """Load configuration from YAML file (memoized on path and mtime)."""
+    path = os.path.abspath(config_path)
+    return copy.deepcopy(_load_config_cached(path, os.path.getmtime(path)))
+
+
 def file_sha256(file_path: Union[str, Path]) -> Optional[str]:
     """Return a SHA-256 hash for an existing file."""
     path = Path(file_path)
@@ -223,30 +408,30 @@ class DataPaths:
     def __init__(self, base_path: str = "."):
         self.base_path = Path(base_path).expanduser().resolve()
         
-    @property
+    @cached_property
     def data_dir(self) -> Path:
         return self.base_path / "data"
         
-    @property
+    @cached_property
     def iv_surfaces_dir(self) -> Path:
         return self.data_dir / "iv_surfaces"
         
-    @property
+    @cached_property
     def q_densities_dir(self) -> Path:
         return self.data_dir / "q_densities"
         
-    @property
+    @cached_property
     def clusters_dir(self) -> Path:
         return self.data_dir / "clusters"
         
-    @property
+    @cached_property
     def risk_premia_dir(self) -> Path:
         return self.data_dir / "risk_premia"
         
-    @property
+    @cached_property
     def results_dir(self) -> Path:
         return self.base_path / "results"
         
-    @property
+    @cached_property
     def figures_dir(self) -> Path:
         return self.results_dir / "figures"
@@ -4,12 +4,169 @@ Mathematical Utilities for BTC-Premia Analysis
 Common mathematical and financial functions used across the project.
 """
 
+import math
 import numpy as np
-import pandas as pd
-from scipy.interpolate import PchipInterpolator
-from scipy.stats.mstats import gmean
 from typing import Tuple, Optional
 
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:  # optional: fall back to the NumPy implementations
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit when numba is not installed."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+@njit(fastmath=True, cache=True, boundscheck=False)
+def _svi_kernel(a, b, rho, m, sigma, k, out):
+    """Fused SVI evaluation over a flat log-moneyness array."""
+    sigma2 = sigma * sigma
+    for i in range(k.shape[0]):
+        d = k[i] - m
+        out[i] = a + b * (rho * d + math.sqrt(d * d + sigma2))
+
+
+@njit(fastmath=True, cache=True)
+def _iv_derivatives_kernel(iv, lr, d1, d2):
+    """Central differences of iv over lr, written to d1/d2 in one pass."""
+    n = iv.shape[0]
+    h = lr[1] - lr[0]
+    d1[0] = (iv[1] - iv[0]) / h
+    d2[0] = (iv[2] - 2 * iv[1] + iv[0]) / (h * h)
+    for i in range(1, n - 1):
+        h = lr[i + 1] - lr[i - 1]
+        d1[i] = (iv[i + 1] - iv[i - 1]) / h
+        d2[i] = (iv[i + 1] - 2 * iv[i] + iv[i - 1]) / (h * h)
+    h = lr[n - 1] - lr[n - 2]
+    d1[n - 1] = (iv[n - 1] - iv[n - 2]) / h
+    d2[n - 1] = (iv[n - 1] - 2 * iv[n - 2] + iv[n - 3]) / (h * h)
+
+
+@njit(cache=True)
+def _pchip_edge_slope(h0, h1, m0, m1):
+    """One-sided shape-preserving end slope, as in scipy's PchipInterpolator."""
+    d = ((2 * h0 + h1) * m0 - h0 * m1) / (h0 + h1)
+    if np.sign(d) != np.sign(m0):
+        return 0.0
+    if np.sign(m0) != np.sign(m1) and abs(d) > 3.0 * abs(m0):
+        return 3.0 * m0
+    return d
+
+
+@njit(cache=True)
+def _pchip_kernel(x, y, x_new, out):
+    """PCHIP slopes and Hermite evaluation in one pass; NaN outside [x[0], x[-1]]."""
+    n = x.shape[0]
+    h = np.empty(n - 1)
+    mk = np.empty(n - 1)
+    for i in range(n - 1):
+        h[i] = x[i + 1] - x[i]
+        mk[i] = (y[i + 1] - y[i]) / h[i]
+    
+    dk = np.empty(n)
+    if n == 2:
+        dk[0] = mk[0]
+        dk[1] = mk[0]
+    else:
+        for i in range(1, n - 1):
+            m0 = mk[i - 1]
+            m1 = mk[i]
+            if m0 == 0.0 or m1 == 0.0 or np.sign(m0) != np.sign(m1):
+                dk[i] = 0.0
+            else:
+                # Weighted harmonic mean of the neighbouring secants
+                w1 = 2 * h[i] + h[i - 1]
+                w2 = h[i] + 2 * h[i - 1]
+                dk[i] = (w1 + w2) / (w1 / m0 + w2 / m1)
+        dk[0] = _pchip_edge_slope(h[0], h[1], mk[0], mk[1])
+        dk[n - 1] = _pchip_edge_slope(h[n - 2], h[n - 3], mk[n - 2], mk[n - 3])
+    
+    for j in range(x_new.shape[0]):
+        xj = x_new[j]
+        if not (x[0] <= xj <= x[n - 1]):
+            out[j] = np.nan
+            continue
+        # Binary search for the interval [x[lo], x[lo + 1]] containing xj
+        lo = 0
+        hi = n - 1
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if x[mid] <= xj:
+                lo = mid
+            else:
+                hi = mid
+        hk = h[lo]
+        t = (xj - x[lo]) / hk
+        t1 = 1.0 - t
+        out[j] = ((1 + 2 * t) * t1 * t1 * y[lo]
+                  + t * t1 * t1 * hk * dk[lo]
+                  + t * t * (3 - 2 * t) * y[lo + 1]
+                  - t * t * t1 * hk * dk[lo + 1])
+
+
+# Grids up to this length are keyed on their full contents; longer grids on
+# their length plus a strided sample (endpoints included), keeping lookups O(1)
+_TRAPEZOID_EXACT_KEY_MAX = 1024
+_TRAPEZOID_KEY_SAMPLES = 64
+_trapezoid_cache = {}
+
+
+def _trapezoid_weights_key(ret: np.ndarray) -> tuple:
+    n = ret.shape[0]
+    if n <= _TRAPEZOID_EXACT_KEY_MAX:
+        return n, ret.tobytes()
+    return n, ret[::n // _TRAPEZOID_KEY_SAMPLES].tobytes(), float(ret[-1])
+
+
+def _compute_trapezoid_weights(ret: np.ndarray) -> np.ndarray:
+    if ret.size < 2:
+        # np.trapz integrates to 0 over fewer than two points
+        w = np.zeros_like(ret)
+    else:
+        dx = np.diff(ret)
+        w = np.empty_like(ret)
+        w[0] = dx[0] / 2
+        w[-1] = dx[-1] / 2
+        w[1:-1] = (dx[:-1] + dx[1:]) / 2
+    w.flags.writeable = False
+    return w
+
+
+def trapezoid_weights(ret: np.ndarray) -> np.ndarray:
+    """
+    Trapezoid-rule weights for a return grid.
+    
+    ``w @ f`` equals ``np.trapz(f, ret)``, so integrals over a fixed grid
+    reduce to dot products. Weights are cached for the last few grids and
+    returned read-only. Grids up to 1024 points (e.g. create_return_grid's
+    201) are matched exactly; longer grids are matched on their length and
+    64 evenly spaced sample points, so two long grids that agree on all of
+    those but differ elsewhere would share weights.
+    
+    Parameters:
+    -----------
+    ret : array-like
+        Return grid; fewer than two points gives all-zero weights
+    
+    Returns:
+    --------
+    array-like
+        Integration weights with the same length as ret
+    """
+    ret = np.ascontiguousarray(ret, dtype=np.float64)
+    key = _trapezoid_weights_key(ret)
+    w = _trapezoid_cache.get(key)
+    if w is None:
+        w = _compute_trapezoid_weights(ret)
+        if len(_trapezoid_cache) >= 4:
+            _trapezoid_cache.pop(next(iter(_trapezoid_cache)))
+        _trapezoid_cache[key] = w
+    return w
+
 
 def svi_model(theta: np.ndarray, k: np.ndarray, tau: float) -> np.ndarray:
     """
@@ -27,12 +184,107 @@ def svi_model(theta: np.ndarray, k: np.ndarray, tau: float) -> np.ndarray:
     Returns:
     --------
     array-like
-        SVI model values
+        SVI model values, of the same type as k (ndarray input is evaluated
+        by the compiled kernel when numba is available)
     """
     base_params = np.array(theta[:5])
     ttm_coeffs = np.array(theta[5:])
     a, b, rho, m, sigma = base_params + ttm_coeffs * tau
-    return a + b * (rho * (k - m) + np.sqrt((k - m) ** 2 + sigma ** 2))
+    if not HAVE_NUMBA or not isinstance(k, np.ndarray):
+        # Non-array k (scalars, pd.Series, ...) keeps its type via NumPy broadcasting
+        return a + b * (rho * (k - m) + np.sqrt((k - m) ** 2 + sigma ** 2))
+    
+    k = np.require(k, dtype=np.float64, requirements='C')
+    out = np.empty_like(k)
+    _svi_kernel(float(a), float(b), float(rho), float(m), float(sigma), k.reshape(-1), out.reshape(-1))
+    return out[()] if out.ndim == 0 else out
+
+
+def make_svi_residual(k: np.ndarray, iv_obs: np.ndarray, tau: float,
+                      penalty: float = 100000.0, epsilon: float = 1e-10):
+    """
+    Build an SVI calibration objective specialized to one maturity slice.
+    
+    The observed slice is fixed when the objective is built, so with numba
+    installed the returned function is compiled for this k/iv_obs pair
+    (array length known at compile time) and each optimizer call avoids all
+    NumPy temporaries. Building it costs a JIT compilation of roughly 70 ms
+    (a few hundred ms for the first build in a process) against a saving of
+    a few microseconds per call, so it only pays off after roughly 10^4
+    evaluations of the same slice; reuse it across the calibration.
+    
+    As in the objective of svi_tau_dependent_estimation.py, every point with
+    negative model variance (svi / tau < -epsilon) adds `penalty`, so the
+    optimizer cannot drift into arbitrage-violating parameters at no cost.
+    Unlike that objective, the residual term is the plain sum of squares
+    rather than the RMSE.
+    
+    Parameters:
+    -----------
+    k : array-like
+        Log-moneyness values of the slice
+    iv_obs : array-like
+        Observed implied volatilities at k
+    tau : float
+        Time to maturity of the slice
+    penalty : float
+        Added once per point with negative model variance
+    epsilon : float
+        Tolerance below zero before the penalty applies
+    
+    Returns:
+    --------
+    callable
+        objective(theta) -> float for a 10-element theta, the sum of squared
+        IV residuals sqrt(max(svi_model(theta, k, tau) / tau, 0)) - iv_obs plus
+        penalties, suitable for scipy.optimize.minimize
+    """
+    k = np.ascontiguousarray(k, dtype=np.float64).reshape(-1)
+    iv_obs = np.ascontiguousarray(iv_obs, dtype=np.float64).reshape(-1)
+    if k.shape != iv_obs.shape:
+        raise ValueError("k and iv_obs must have the same length")
+    tau = float(tau)
+    penalty = float(penalty)
+    epsilon = float(epsilon)
+    n = k.shape[0]
+    
+    def _check_theta(theta):
+        theta = np.ascontiguousarray(theta, dtype=np.float64).reshape(-1)
+        if theta.shape[0] != 10:
+            raise ValueError(f"theta must have 10 SVI parameters, got {theta.shape[0]}")
+        return theta
+    
+    if not HAVE_NUMBA:
+        def objective(theta):
+            variance = svi_model(_check_theta(theta), k, tau) / tau
+            residuals = np.sqrt(np.maximum(variance, 0.0)) - iv_obs
+            return float(residuals @ residuals + penalty * np.count_nonzero(variance < -epsilon))
+        
+        return objective
+    
+    def _sse(theta):
+        a = theta[0] + theta[5] * tau
+        b = theta[1] + theta[6] * tau
+        rho = theta[2] + theta[7] * tau
+        m = theta[3] + theta[8] * tau
+        sigma = theta[4] + theta[9] * tau
+        sigma2 = sigma * sigma
+        total = 0.0
+        for i in range(n):
+            d = k[i] - m
+            variance = (a + b * (rho * d + math.sqrt(d * d + sigma2))) / tau
+            if variance < -epsilon:
+                total += penalty
+            r = math.sqrt(max(variance, 0.0)) - iv_obs[i]
+            total += r * r
+        return total
+    
+    compiled = njit('float64(float64[::1])', fastmath=True)(_sse)
+    
+    def objective(theta):
+        return compiled(_check_theta(theta))
+    
+    return objective
 
 
 def clr_transform(x: np.ndarray) -> np.ndarray:
@@ -47,9 +299,12 @@ def clr_transform(x: np.ndarray) -> np.ndarray:
     Returns:
     --------
     array-like
-        CLR transformed data: log(x) - log(gmean(x))
+        CLR transformed data: log(x) - log(gmean(x)), computed along axis 0
+        as log(x) - mean(log(x))
     """
-    return np.log(x) - np.log(gmean(x))
+    log_x = np.log(x)
+    # np.asarray so NaN propagates like gmean (DataFrame.mean would skip it)
+    return log_x - np.asarray(log_x).mean(axis=0)
 
 
 def compute_iv_derivatives(iv: np.ndarray, log_ret: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
@@ -68,6 +323,20 @@ def compute_iv_derivatives(iv: np.ndarray, log_ret: np.ndarray) -> Tuple[np.ndar
     tuple
         (first_derivative, second_derivative)
     """
+    if HAVE_NUMBA:
+        iv = np.ascontiguousarray(iv, dtype=np.float64)
+        log_ret = np.ascontiguousarray(log_ret, dtype=np.float64)
+        # The kernel does no bounds checking; fail like the NumPy slicing path
+        if iv.ndim != 1 or iv.shape != log_ret.shape:
+            raise ValueError(f"iv and log_ret must be 1-D arrays of equal length, "
+                             f"got shapes {iv.shape} and {log_ret.shape}")
+        if iv.shape[0] < 3:
+            raise IndexError("compute_iv_derivatives needs at least 3 grid points")
+        div_dr = np.empty_like(iv)
+        d2iv_dr2 = np.empty_like(iv)
+        _iv_derivatives_kernel(iv, log_ret, div_dr, d2iv_dr2)
+        return div_dr, d2iv_dr2
+    
     # First derivative using central differences
     div_dr = np.zeros_like(iv)
     div_dr[1:-1] = (iv[2:] - iv[:-2]) / (log_ret[2:] - log_ret[:-2])
@@ -101,13 +370,19 @@ def compute_density_moments(ret: np.ndarray, density: np.ndarray, ttm: int) -> d
     dict
         Dictionary with moments M1-M6, scaled by 365/ttm
     """
-    # Compute raw moments
-    m1 = np.trapz(density * ret, ret)
-    m2 = np.trapz(density * (ret - m1)**2, ret)
-    m3 = np.trapz(density * (ret - m1)**3, ret)
-    m4 = np.trapz(density * (ret - m1)**4, ret)
-    m5 = np.trapz(density * (ret - m1)**5, ret)
-    m6 = np.trapz(density * (ret - m1)**6, ret)
+    # Trapezoid weights on the return grid, so every integral below
+    # reduces to a dot product with the weighted density
+    ret = np.asarray(ret, dtype=float)
+    wd = trapezoid_weights(ret) * np.asarray(density, dtype=float)
+    
+    # First raw moment, then central moments 2-6 built by repeated products
+    m1 = wd @ ret
+    c = ret - m1
+    powers = np.empty((5, c.shape[0]))
+    powers[0] = c * c
+    for i in range(1, 5):
+        np.multiply(powers[i - 1], c, out=powers[i])
+    m2, m3, m4, m5, m6 = powers @ wd
     
     # Scale by annualization factor
     scaling = 365 / ttm
@@ -145,8 +420,25 @@ def interpolate_density(returns: np.ndarray, density: np.ndarray,
         Interpolated density values
     """
     if method.lower() == 'pchip':
-        interp_func = PchipInterpolator(returns, density, extrapolate=False)
-        interpolated = interp_func(new_returns)
+        returns = np.ascontiguousarray(returns, dtype=np.float64)
+        density_1d = np.asarray(density)
+        # The kernel does no bounds checking: only use it for a single density
+        # on a matching, strictly increasing grid; scipy validates the rest
+        use_kernel = (HAVE_NUMBA
+                      and returns.ndim == 1 and returns.shape[0] >= 2
+                      and density_1d.ndim == 1 and density_1d.shape == returns.shape
+                      and np.all(np.diff(returns) > 0))
+        if use_kernel:
+            # Compiled PCHIP avoids building a PchipInterpolator for every density
+            new_returns = np.require(new_returns, dtype=np.float64, requirements='C')
+            interpolated = np.empty_like(new_returns)
+            _pchip_kernel(returns, np.ascontiguousarray(density_1d, dtype=np.float64),
+                          new_returns.reshape(-1), interpolated.reshape(-1))
+        else:
+            from scipy.interpolate import PchipInterpolator
+            
+            interp_func = PchipInterpolator(returns, density, extrapolate=False)
+            interpolated = interp_func(new_returns)
         # Set extrapolated values to 0
         interpolated[np.isnan(interpolated)] = 0
     else:
@@ -155,6 +447,56 @@ def interpolate_density(returns: np.ndarray, density: np.ndarray,
     return interpolated
 
 
+def _interpolate_density_chunk(returns_chunk, density_chunk, new_returns, method):
+    return [interpolate_density(r, d, new_returns, method) for r, d in zip(returns_chunk, density_chunk)]
+
+
+def interpolate_densities_batch(returns_list: list, density_list: list,
+                                new_returns: np.ndarray,
+                                method: str = 'pchip',
+                                n_jobs: int = -1,
+                                chunk_size: int = 100) -> np.ndarray:
+    """
+    Interpolate many densities (e.g. one per date) to a common return grid in parallel.
+    
+    Parameters:
+    -----------
+    returns_list : list of array-like
+        Original return grid of each density
+    density_list : list of array-like
+        Original density values, aligned with returns_list
+    new_returns : array-like
+        Common return grid for interpolation
+    method : str
+        Interpolation method ('pchip', 'linear'), see interpolate_density
+    n_jobs : int
+        Number of joblib workers (-1 uses all cores)
+    chunk_size : int
+        Densities per task, to amortize pickling of new_returns
+    
+    Returns:
+    --------
+    array-like
+        Interpolated densities, shape (len(density_list), len(new_returns))
+    """
+    from joblib import Parallel, delayed
+    
+    returns_list = list(returns_list)
+    density_list = list(density_list)
+    if len(returns_list) != len(density_list):
+        raise ValueError("returns_list and density_list must have the same length")
+    if not density_list:
+        return np.empty((0, len(new_returns)))
+    
+    chunks = Parallel(n_jobs=n_jobs)(
+        delayed(_interpolate_density_chunk)(returns_list[i:i + chunk_size],
+                                            density_list[i:i + chunk_size],
+                                            new_returns, method)
+        for i in range(0, len(density_list), chunk_size)
+    )
+    return np.vstack([row for chunk in chunks for row in chunk])
+
+
 def normalize_density(density: np.ndarray, returns: np.ndarray) -> np.ndarray:
     """
     Normalize density to integrate to 1.
@@ -171,13 +513,39 @@ def normalize_density(density: np.ndarray, returns: np.ndarray) -> np.ndarray:
     array-like
         Normalized density
     """
-    integral = np.trapz(density, returns)
+    integral = trapezoid_weights(returns) @ density
     if integral > 0:
         return density / integral
     else:
         return density
 
 
+def normalize_density_inplace(density: np.ndarray, returns: np.ndarray,
+                              weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Normalize density to integrate to 1, overwriting the input array.
+    
+    Parameters:
+    -----------
+    density : np.ndarray
+        Density values (floating point); modified in place
+    returns : array-like
+        Return grid
+    weights : array-like, optional
+        Precomputed trapezoid_weights(returns), to reuse across many densities
+    
+    Returns:
+    --------
+    np.ndarray
+        The same density array, normalized
+    """
+    w = weights if weights is not None else trapezoid_weights(returns)
+    integral = w @ density
+    if integral > 0:
+        density *= 1.0 / integral
+    return density
+
+
 def calculate_bitcoin_premium(ret: np.ndarray, 
                              p_density: np.ndarray, 
                              q_density: np.ndarray, 
@@ -205,8 +573,9 @@ def calculate_bitcoin_premium(ret: np.ndarray,
         Bitcoin premium (annualized)
     """
     # Expected returns under P and Q measures
-    e_p = np.trapz(ret * p_density, ret)
-    e_q = np.trapz(ret * q_density, ret) if q_density is not None else risk_free_rate * ttm / 365
+    w = trapezoid_weights(ret)
+    e_p = (w * p_density) @ ret
+    e_q = (w * q_density) @ ret if q_density is not None else risk_free_rate * ttm / 365
     
     # Annualize
     bp = (e_p - e_q) * 365 / ttm
@@ -238,12 +607,15 @@ def calculate_variance_risk_premium(ret: np.ndarray,
         Variance risk premium (annualized)
     """
     # Expected returns
-    e_p = np.trapz(ret * p_density, ret)
-    e_q = np.trapz(ret * q_density, ret)
+    w = trapezoid_weights(ret)
+    wp = w * p_density
+    wq = w * q_density
+    e_p = wp @ ret
+    e_q = wq @ ret
     
     # Variances
-    var_p = np.trapz((ret - e_p)**2 * p_density, ret)
-    var_q = np.trapz((ret - e_q)**2 * q_density, ret)
+    var_p = (ret - e_p)**2 @ wp
+    var_q = (ret - e_q)**2 @ wq
     
     # VRP (annualized)
     vrp = (var_q - var_p) * 365 / ttm
@@ -267,20 +639,35 @@ def check_svi_constraints(theta: np.ndarray, ttm_values: np.ndarray) -> bool:
     bool
         True if constraints are satisfied
     """
-    base_params = np.array(theta[:5])
-    ttm_coeffs = np.array(theta[5:])
+    theta = np.asarray(theta, dtype=float)
+    ttm_values = np.asarray(ttm_values, dtype=float).reshape(-1)
     
-    for ttm in ttm_values:
-        a, b, rho, m, sigma = base_params + ttm_coeffs * ttm
-        
-        # Check constraints
-        if b <= 0:  # b > 0
-            return False
-        if abs(rho) >= 1:  # |rho| < 1
-            return False
-        if sigma <= 0:  # sigma > 0
-            return False
-        if a + b * sigma * np.sqrt(1 - rho**2) <= 0:  # no calendar arbitrage
-            return False
-    
-    return True 
\ No newline at end of file
+    if ttm_values.shape[0] <= 64:
+        # Few maturities (the pipeline uses 4): a loop over Python floats
+        # beats both NumPy-scalar arithmetic and array dispatch overhead
+        a0, b0, rho0, m0, sigma0 = theta[:5].tolist()
+        a1, b1, rho1, m1, sigma1 = theta[5:].tolist()
+        for ttm in ttm_values.tolist():
+            b = b0 + b1 * ttm
+            rho = rho0 + rho1 * ttm
+            sigma = sigma0 + sigma1 * ttm
+            if b <= 0 or sigma <= 0 or abs(rho) >= 1:  # b > 0, sigma > 0, |rho| < 1
+                return False
+            if a0 + a1 * ttm + b * sigma * math.sqrt(1 - rho * rho) <= 0:  # no calendar arbitrage
+                return False
+        return True
+    
+    # Parameters at every maturity at once, shape (T, 5)
+    params = theta[None, :5] + theta[None, 5:] * ttm_values[:, None]
+    b, rho, sigma = params[:, 1], params[:, 2], params[:, 4]
+    
+    # Cheap sign checks first, so most bad candidates never reach the sqrt
+    if (b <= 0).any():  # b > 0
+        return False
+    if (sigma <= 0).any():  # sigma > 0
+        return False
+    if (np.abs(rho) >= 1).any():  # |rho| < 1
+        return False
+    
+    a = params[:, 0]
+    return not (a + b * sigma * np.sqrt(1 - rho * rho) <= 0).any()  # no calendar arbitrage
@@ -0,0 +1,325 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import PchipInterpolator
+from scipy.stats.mstats import gmean
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from utils import data_utils, math_utils  # noqa: E402
+
+
+def _lognormal_density(ret: np.ndarray) -> np.ndarray:
+    gross = 1.0 + ret
+    density = np.exp(-np.log(gross) ** 2 / (2 * 0.3 ** 2)) / (gross * 0.3 * np.sqrt(2 * np.pi))
+    return density
+
+
+class MathUtilsTest(unittest.TestCase):
+    def setUp(self):
+        self.ret = np.arange(-0.9, 1.0 + 0.01, 0.01)
+        self.density = _lognormal_density(self.ret)
+
+    def test_density_moments_match_trapezoid_rule(self):
+        ret, density = self.ret, self.density
+        m1 = np.trapz(density * ret, ret)
+        expected = [m1] + [np.trapz(density * (ret - m1) ** k, ret) for k in range(2, 7)]
+
+        moments = math_utils.compute_density_moments(ret, density, ttm=27)
+        scaling = 365 / 27
+        for k, value in enumerate(expected, start=1):
+            self.assertAlmostEqual(moments[f"M{k}"], value * scaling, places=10)
+
+    def test_trapezoid_weights_match_trapz_on_nonuniform_grid(self):
+        grid = np.sort(np.random.default_rng(0).uniform(-1.0, 1.0, 50))
+        values = np.cos(grid)
+        self.assertAlmostEqual(math_utils.trapezoid_weights(grid) @ values, np.trapz(values, grid), places=12)
+
+    def test_normalize_density_inplace(self):
+        density = 3.0 * self.density
+        expected = density / np.trapz(density, self.ret)
+        np.testing.assert_allclose(math_utils.normalize_density(density, self.ret), expected)
+
+        result = math_utils.normalize_density_inplace(density, self.ret)
+        self.assertIs(result, density)
+        np.testing.assert_allclose(density, expected)
+
+    def test_trapezoid_weights_on_long_grids(self):
+        uniform = np.linspace(-1.0, 1.0, 20001)
+        stretched = np.sign(uniform) * uniform ** 2
+        for grid in (uniform, stretched, uniform):
+            values = np.exp(-grid ** 2)
+            self.assertAlmostEqual(math_utils.trapezoid_weights(grid) @ values, np.trapz(values, grid), places=12)
+
+    def test_single_point_grid_integrates_to_zero(self):
+        grid = np.array([0.0])
+        np.testing.assert_array_equal(math_utils.trapezoid_weights(grid), [0.0])
+        np.testing.assert_array_equal(math_utils.normalize_density(np.array([2.0]), grid), [2.0])
+
+    def test_premia_match_trapezoid_rule(self):
+        ret = self.ret
+        p_density = self.density
+        q_density = _lognormal_density(ret * 1.1)
+        e_p, e_q = np.trapz(ret * p_density, ret), np.trapz(ret * q_density, ret)
+        var_p = np.trapz((ret - e_p) ** 2 * p_density, ret)
+        var_q = np.trapz((ret - e_q) ** 2 * q_density, ret)
+
+        self.assertAlmostEqual(
+            math_utils.calculate_bitcoin_premium(ret, p_density, q_density, ttm=27),
+            (e_p - e_q) * 365 / 27,
+            places=10,
+        )
+        self.assertAlmostEqual(
+            math_utils.calculate_variance_risk_premium(ret, p_density, q_density, ttm=27),
+            (var_q - var_p) * 365 / 27,
+            places=10,
+        )
+
+    def test_iv_derivatives_central_differences(self):
+        log_ret = np.sort(np.random.default_rng(1).uniform(-1.0, 1.0, 30))
+        iv = 0.5 + 0.2 * log_ret ** 2
+        div_dr, d2iv_dr2 = math_utils.compute_iv_derivatives(iv, log_ret)
+
+        span = log_ret[2:] - log_ret[:-2]
+        np.testing.assert_allclose(div_dr[1:-1], (iv[2:] - iv[:-2]) / span)
+        np.testing.assert_allclose(d2iv_dr2[1:-1], (iv[2:] - 2 * iv[1:-1] + iv[:-2]) / span ** 2)
+        self.assertAlmostEqual(div_dr[0], (iv[1] - iv[0]) / (log_ret[1] - log_ret[0]))
+        self.assertAlmostEqual(
+            d2iv_dr2[-1], (iv[-1] - 2 * iv[-2] + iv[-3]) / (log_ret[-1] - log_ret[-2]) ** 2
+        )
+
+    def test_iv_derivatives_reject_short_or_mismatched_grids(self):
+        with self.assertRaises(IndexError):
+            math_utils.compute_iv_derivatives(np.array([0.5, 0.6]), np.array([0.0, 0.1]))
+        with self.assertRaises(ValueError):
+            math_utils.compute_iv_derivatives(np.linspace(0.5, 0.6, 5), np.linspace(-1.0, 1.0, 4))
+
+    def test_clr_transform_matches_gmean_definition(self):
+        matrix = np.random.default_rng(2).uniform(0.1, 2.0, size=(40, 3))
+        np.testing.assert_allclose(math_utils.clr_transform(matrix), np.log(matrix) - np.log(gmean(matrix)))
+        np.testing.assert_allclose(
+            math_utils.clr_transform(matrix[:, 0]), np.log(matrix[:, 0]) - np.log(gmean(matrix[:, 0]))
+        )
+
+        # A missing point makes the whole column NaN, for arrays and DataFrames alike
+        matrix[5, 1] = np.nan
+        for data in (matrix, pd.DataFrame(matrix)):
+            result = np.asarray(math_utils.clr_transform(data))
+            self.assertTrue(np.isnan(result[:, 1]).all())
+            np.testing.assert_allclose(result[:, 0], np.log(matrix[:, 0]) - np.log(gmean(matrix[:, 0])))
+
+    def test_pchip_interpolation_matches_scipy(self):
+        rng = np.random.default_rng(3)
+        grid = np.sort(rng.uniform(-1.0, 1.0, 40))
+        values = np.abs(np.sin(4 * grid)) + rng.uniform(0.0, 0.1, 40)
+        values[10:14] = values[10]  # flat stretch exercises the zero-slope branch
+        new_returns = np.linspace(-1.2, 1.2, 301)
+
+        expected = PchipInterpolator(grid, values, extrapolate=False)(new_returns)
+        expected[np.isnan(expected)] = 0
+        np.testing.assert_allclose(
+            math_utils.interpolate_density(grid, values, new_returns), expected, rtol=1e-10, atol=1e-12
+        )
+
+    def test_pchip_interpolation_rejects_mismatched_density(self):
+        grid = np.linspace(-1.0, 1.0, 20)
+        with self.assertRaises(ValueError):
+            math_utils.interpolate_density(grid, np.ones(15), np.linspace(-0.5, 0.5, 5))
+
+    def test_pchip_interpolation_of_stacked_densities(self):
+        grid = np.linspace(-0.9, 1.0, 20)
+        densities = np.column_stack([_lognormal_density(grid), _lognormal_density(grid * 0.5)])
+        new_returns = np.linspace(-0.5, 0.5, 7)
+        result = math_utils.interpolate_density(grid, densities, new_returns)
+        self.assertEqual(result.shape, (7, 2))
+        np.testing.assert_allclose(result[:, 1], math_utils.interpolate_density(grid, densities[:, 1], new_returns))
+
+    def test_interpolate_densities_batch_matches_single_calls(self):
+        grids = [self.ret, self.ret[::2], self.ret[1::3]]
+        densities = [_lognormal_density(grid) for grid in grids]
+        new_returns = np.linspace(-0.5, 0.5, 25)
+
+        batch = math_utils.interpolate_densities_batch(grids, densities, new_returns, n_jobs=1, chunk_size=2)
+        expected = [math_utils.interpolate_density(g, d, new_returns) for g, d in zip(grids, densities)]
+        np.testing.assert_allclose(batch, np.vstack(expected))
+
+    def test_svi_model_matches_closed_form(self):
+        theta = np.array([0.04, 0.1, -0.3, 0.02, 0.2, 0.01, 0.02, 0.05, -0.01, 0.03])
+        k = np.linspace(-1.0, 1.0, 41)
+        tau = 27 / 365
+        a, b, rho, m, sigma = theta[:5] + theta[5:] * tau
+        expected = a + b * (rho * (k - m) + np.sqrt((k - m) ** 2 + sigma ** 2))
+        np.testing.assert_allclose(math_utils.svi_model(theta, k, tau), expected, rtol=1e-12)
+
+        series = math_utils.svi_model(theta, pd.Series(k), tau)
+        self.assertIsInstance(series, pd.Series)
+        np.testing.assert_allclose(series.to_numpy(), expected, rtol=1e-12)
+
+    def test_svi_residual_objective(self):
+        theta = np.array([0.04, 0.1, -0.3, 0.02, 0.2, 0.01, 0.02, 0.05, -0.01, 0.03])
+        k = np.linspace(-0.8, 0.8, 33)
+        tau = 27 / 365
+        iv_obs = np.sqrt(math_utils.svi_model(theta, k, tau) / tau) + 0.01
+
+        objective = math_utils.make_svi_residual(k, iv_obs, tau)
+        self.assertAlmostEqual(objective(theta), k.shape[0] * 0.01 ** 2, places=10)
+        self.assertAlmostEqual(objective(list(theta)), objective(theta))
+
+        # Negative total variance is penalized per point, as in the estimation script
+        negative = theta.copy()
+        negative[0] = -1.0
+        variance = math_utils.svi_model(negative, k, tau) / tau
+        self.assertGreaterEqual(objective(negative), 100000.0 * np.count_nonzero(variance < -1e-10))
+        self.assertGreater(np.count_nonzero(variance < 0), 0)
+
+        with self.assertRaises(ValueError):
+            objective(theta[:5])
+
+    def test_svi_constraints(self):
+        ttms = np.array([5, 9, 14, 27]) / 365
+        valid = np.array([0.04, 0.1, -0.3, 0.02, 0.2, 0.0, 0.0, 0.0, 0.0, 0.0])
+        self.assertTrue(math_utils.check_svi_constraints(valid, ttms))
+
+        # rho drifts outside (-1, 1) only at the longest maturity
+        drifting = valid.copy()
+        drifting[7] = -26.0
+        self.assertFalse(math_utils.check_svi_constraints(drifting, ttms))
+
+        negative_b = valid.copy()
+        negative_b[1] = -0.1
+        self.assertFalse(math_utils.check_svi_constraints(negative_b, ttms))
+
+        # Many maturities take the vectorized path and must agree with the loop
+        many_ttms = np.linspace(1, 365, 100) / 365
+        self.assertTrue(math_utils.check_svi_constraints(valid, many_ttms))
+        self.assertFalse(math_utils.check_svi_constraints(drifting, many_ttms))
+        self.assertFalse(math_utils.check_svi_constraints(negative_b, many_ttms))
+
+
+class DataUtilsTest(unittest.TestCase):
+    def test_extract_dates_from_filenames(self):
+        names = [
+            "btc_Q_2020-01-01.csv",
+            "iv_20200102.csv",
+            "surface_2020_01_03.csv",
+            "notes.txt",
+            "run_12345678_2020-01-04.csv",  # YYYY-MM-DD takes priority over YYYYMMDD
+        ]
+        expected = ["2020-01-01", "2020-01-02", "2020-01-03", None, "2020-01-04"]
+        self.assertEqual([data_utils.extract_date_from_filename(name) for name in names], expected)
+        self.assertEqual(list(data_utils.extract_dates(names)), expected)
+
+    def test_filter_option_data(self):
+        options = pd.DataFrame({
+            "IV": [0.5, 0.0, 0.6, 0.7, 0.8],
+            "tau": [0.1, 0.1, 0.0, 0.1, 0.1],
+            "option_price": [20.0, 20.0, 20.0, 5.0, 20.0],
+            "BTC_price": [9000.0, 9000.0, 9000.0, 9000.0, 1000.0],
+            "K": [10000.0, 9000.0, 8000.0, 7000.0, 1000.0],
+        })
+        filtered = data_utils.filter_option_data(options)
+        self.assertEqual(filtered.index.tolist(), [0])
+
+        chain = data_utils.filter_option_data(data_utils.OptionChain.from_dataframe(options))
+        self.assertEqual(len(chain), 1)
+        self.assertEqual(chain.K.tolist(), [10000.0])
+
+    def test_option_chain_moneyness_matches_dataframe(self):
+        options = pd.DataFrame({
+            "IV": [0.5, 0.6],
+            "tau": [0.1, 0.2],
+            "option_price": [20.0, 30.0],
+            "BTC_price": [9000.0, 9500.0],
+            "K": [10000.0, 9000.0],
+        })
+        chain = data_utils.calculate_moneyness(data_utils.OptionChain.from_dataframe(options))
+        frame = data_utils.calculate_moneyness(options.copy())
+        np.testing.assert_allclose(chain.moneyness, frame["moneyness"].to_numpy())
+        self.assertTrue(chain.moneyness.flags.c_contiguous)
+
+    def test_get_common_dates(self):
+        left = pd.DataFrame({"Date": ["2020-01-03", "2020-01-01", "2020-01-02", "2020-01-01"]})
+        right = pd.DataFrame({"Date": ["2020-01-02", "2020-01-03", "2020-01-04"]})
+        self.assertEqual(data_utils.get_common_dates(left, right), ["2020-01-02", "2020-01-03"])
+        self.assertEqual(data_utils.get_common_dates(), [])
+
+    def test_read_numeric_csv_returns_writable_float_frame(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = Path(tmp) / "Q_matrix_5day_0d15.csv"
+            csv_path.write_text("Return,2020-01-01,2020-01-02\n-0.01,0.25,\n0.00,0.50,\n0.01,0.25,\n")
+            frame = data_utils.read_numeric_csv(csv_path)
+
+        self.assertTrue((frame.dtypes == np.float64).all())
+        self.assertTrue(frame["2020-01-02"].isna().all())
+        frame.iloc[0, 1] = 1.0
+        frame.loc[0, "Return"] = 0.0
+        frame["2020-01-01"] *= 2
+        self.assertEqual(frame.loc[0, "2020-01-01"], 2.0)
+
+    def test_q_matrices_prefer_fresh_npy_copy(self):
+        source = ROOT / "tests" / "fixtures" / "Q_matrix" / "Tau-independent" / "unique" / "moneyness_step_0d01"
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = Path(tmp) / "Q_matrix_5day_0d15.csv"
+            shutil.copy(source / csv_path.name, csv_path)
+            expected = data_utils.load_q_matrices(tmp, [5])[5]
+
+            data_utils.save_results(expected * 2, str(csv_path.with_suffix(".npy")), file_format="npy")
+            loaded = data_utils.load_q_matrices(tmp, [5])[5]
+            pd.testing.assert_frame_equal(loaded, expected * 2)
+
+    def test_load_q_matrices_reads_npy_without_csv(self):
+        frame = pd.DataFrame({"Return": [-0.01, 0.0, 0.01], "2020-01-01": [0.25, 0.5, 0.25]})
+        with tempfile.TemporaryDirectory() as tmp:
+            data_utils.save_results(frame, str(Path(tmp) / "Q_matrix_5day_0d15.npy"), file_format="npy")
+            pd.testing.assert_frame_equal(data_utils.load_q_matrices(tmp, [5])[5], frame)
+
+    def test_ensure_dir_creates_and_returns_directory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / "plots" / "Combined"
+            created = data_utils.ensure_dir(str(target))
+            self.assertTrue(target.is_dir())
+            self.assertEqual(created, target.absolute())
+            self.assertIs(data_utils.ensure_dir(target), created)
+
+    def test_save_results_creates_missing_directories(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = Path(tmp) / "nested" / "results.csv"
+            data_utils.save_results({"x": [1, 2]}, str(output_path))
+            self.assertEqual(pd.read_csv(output_path)["x"].tolist(), [1, 2])
+
+            # The directory is re-created if it was removed between saves
+            shutil.rmtree(output_path.parent)
+            data_utils.save_results({"x": [3]}, str(output_path))
+            self.assertEqual(pd.read_csv(output_path)["x"].tolist(), [3])
+
+    @unittest.skipIf(data_utils._pyarrow() is None, "pyarrow is not installed")
+    def test_save_results_parquet_round_trip(self):
+        frame = pd.DataFrame({"Return": [-0.01, 0.0, 0.01], "2020-01-01": [0.25, 0.5, 0.25]})
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = Path(tmp) / "Q_matrix_5day_0d15.parquet"
+            data_utils.save_results(frame, str(output_path), file_format="parquet")
+            pd.testing.assert_frame_equal(pd.read_parquet(output_path), frame)
+
+    def test_data_paths_are_built_once(self):
+        paths = data_utils.DataPaths("/tmp/btc")
+        self.assertEqual(paths.q_densities_dir, Path("/tmp/btc/data/q_densities").resolve())
+        self.assertIs(paths.q_densities_dir, paths.q_densities_dir)
+        self.assertEqual(paths.figures_dir, paths.results_dir / "figures")
+
+    def test_load_config_returns_independent_copies(self):
+        config_path = ROOT / "config" / "parameters.yaml"
+        first = data_utils.load_config(str(config_path))
+        first["mutated"] = True
+        second = data_utils.load_config(str(config_path))
+        self.assertNotIn("mutated", second)
+        self.assertGreaterEqual(data_utils._load_config_cached.cache_info().hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()